@@ -1,17 +1,37 @@
 from openai import OpenAI
-import json
 from riddle_history import RiddleHistory
 import random
-from datetime import datetime
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from claude_client import ClaudeClient
+from riddle_stream_parser import RiddleStreamParser
+
+class RateLimiter:
+    """Thread-safe limiter spacing out API calls shared by all workers"""
+    def __init__(self, requests_per_minute=30):
+        self.interval = 60.0 / requests_per_minute
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            wait = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.interval
+        if wait > 0:
+            time.sleep(wait)
 
 class AdvancedRiddleGenerator:
-    def __init__(self, api_key):
+    def __init__(self, api_key, requests_per_minute=30):
         self.client = ClaudeClient(
             api_key=api_key,
             site_name="RiddleGenerator"
         )
         self.history = RiddleHistory()
+        self.rate_limiter = RateLimiter(requests_per_minute)
+        self.history_lock = threading.Lock()
         
         self.categories = [
             "nature", "food", "technology", "space", "animals", "sports",
@@ -27,9 +47,9 @@ class AdvancedRiddleGenerator:
             "mathematical", "logical", "what-am-i", "sequence", "transformation"
         ]
 
-    def _get_theme_rotation(self):
-        """Get theme combination based on current date to ensure variety"""
-        today = datetime.now()
+    def _get_theme_rotation(self, date=None):
+        """Get theme combination based on the date to ensure variety"""
+        today = date or datetime.now()
         day_of_year = today.timetuple().tm_yday
         
         category = self.categories[day_of_year % len(self.categories)]
@@ -38,8 +58,61 @@ class AdvancedRiddleGenerator:
         
         return category, complexity, riddle_type
 
-    def _generate_riddle_batch(self, count, attempt=1):
-        category, complexity, riddle_type = self._get_theme_rotation()
+    def build_schedule(self, days=7, start_date=None):
+        """Theme rotation for the coming days, for use with generate_riddle_sets"""
+        start_date = start_date or datetime.now()
+        schedule = []
+        for offset in range(days):
+            category, complexity, riddle_type = self._get_theme_rotation(start_date + timedelta(days=offset))
+            schedule.append({'category': category, 'riddle_type': riddle_type, 'complexity': complexity})
+        return schedule
+
+    def _prompt_with_retry(self, prompt, max_retries=3, base_delay=2):
+        """Rate-limited client.prompt with exponential backoff on errors"""
+        response = {"status": "error", "error": "No attempts made"}
+        for retry in range(max_retries + 1):
+            self.rate_limiter.acquire()
+            try:
+                response = self.client.prompt(message=prompt)
+            except Exception as e:
+                response = {"status": "error", "error": str(e)}
+            if response["status"] != "error":
+                return response
+            if retry < max_retries:
+                delay = base_delay * (2 ** retry) + random.uniform(0, base_delay)
+                print(f"API call failed ({response.get('error')}), retrying in {delay:.1f}s...")
+                time.sleep(delay)
+        return response
+
+    def _stream_with_retry(self, prompt, max_retries=3, base_delay=2):
+        """Rate-limited client.prompt_stream with the same backoff as _prompt_with_retry.
+
+        A stream that fails before producing any text is retried. One that
+        fails midway ends the batch, keeping the riddles already parsed.
+        Errors are never raised to the caller.
+        """
+        for retry in range(max_retries + 1):
+            self.rate_limiter.acquire()
+            received = False
+            try:
+                for chunk in self.client.prompt_stream(message=prompt):
+                    received = True
+                    yield chunk
+                return
+            except Exception as e:
+                if received:
+                    print(f"Stream interrupted ({str(e)}), keeping riddles received so far")
+                    return
+                error = str(e)
+            if retry < max_retries:
+                delay = base_delay * (2 ** retry) + random.uniform(0, base_delay)
+                print(f"API call failed ({error}), retrying in {delay:.1f}s...")
+                time.sleep(delay)
+        print(f"Error from API: {error}")
+
+    def _generate_riddle_batch(self, count, attempt=1, theme=None):
+        """Request a batch of riddles and yield each valid one as soon as it is parsed"""
+        category, complexity, riddle_type = theme or self._get_theme_rotation()
         
         prompt = f"""Generate {count} unique, creative riddles about {category} using {riddle_type} style at {complexity} difficulty.
         
@@ -71,57 +144,73 @@ class AdvancedRiddleGenerator:
         ]
         """
         
-        response = self.client.prompt(message=prompt)
+        parser = RiddleStreamParser()
+        for chunk in self._request_chunks(prompt):
+            for riddle in parser.feed(chunk):
+                if self._validate_riddle(riddle, category, complexity, riddle_type):
+                    yield riddle
+        
+        if parser.objects_skipped:
+            print(f"Salvaged {parser.objects_found} riddles, skipped {parser.objects_skipped} malformed")
+        elif not parser.objects_found:
+            print("No riddles found in response")
+
+    def _request_chunks(self, prompt):
+        """Response text for a prompt, streamed when the client supports it"""
+        if hasattr(self.client, 'prompt_stream'):
+            return self._stream_with_retry(prompt)
+        
+        response = self._prompt_with_retry(prompt)
         
         if response["status"] == "error":
             print(f"Error from API: {response.get('error')}")
-            return None
+            return []
             
         if not response["message"]:
             print("No message in response")
-            return None
-            
-        try:
-            print(f"Attempting to parse JSON response: {response['message'][:200]}...")  # Print first 200 chars for debugging
-            riddles = json.loads(response['message'])
-            valid_riddles = []
+            return []
+        
+        print(f"Parsing response: {response['message'][:200]}...")  # Print first 200 chars for debugging
+        return [response['message']]
+
+    def _validate_riddle(self, riddle, category, complexity, riddle_type):
+        """Check length constraints and attach metadata to a valid riddle"""
+        if (not isinstance(riddle, dict) or
+                not isinstance(riddle.get('question'), str) or
+                not isinstance(riddle.get('answer'), str)):
+            print(f"Invalid riddle format: {riddle}")
+            return False
             
-            if not isinstance(riddles, list):
-                print(f"Expected list but got {type(riddles)}")
-                return None
-                
-            for riddle in riddles:
-                if not isinstance(riddle, dict) or 'question' not in riddle or 'answer' not in riddle:
-                    print(f"Invalid riddle format: {riddle}")
-                    continue
-                    
-                question_words = len(riddle['question'].split())
-                answer_words = len(riddle['answer'].split())
-                
-                if (10 <= question_words <= 15 and 
-                    8 <= answer_words <= 12 and 
-                    '\n' not in riddle['question'] and 
-                    '\n' not in riddle['answer']):
-                    
-                    riddle['metadata'] = {
-                        'category': category,
-                        'complexity': complexity,
-                        'type': riddle_type,
-                        'generated_date': datetime.now().isoformat(),
-                        'question_words': question_words,
-                        'answer_words': answer_words
-                    }
-                    valid_riddles.append(riddle)
-                    
-            return valid_riddles
+        question_words = len(riddle['question'].split())
+        answer_words = len(riddle['answer'].split())
+        
+        if not (10 <= question_words <= 15 and 
+                8 <= answer_words <= 12 and 
+                '\n' not in riddle['question'] and 
+                '\n' not in riddle['answer']):
+            return False
             
-        except json.JSONDecodeError as e:
-            print(f"JSON parsing error: {str(e)}")
-            print(f"Raw response: {response['message']}")
-            return None
+        riddle['metadata'] = {
+            'category': category,
+            'complexity': complexity,
+            'type': riddle_type,
+            'generated_date': datetime.now().isoformat(),
+            'question_words': question_words,
+            'answer_words': answer_words
+        }
+        return True
+
+    def _claim_unique(self, riddle, claimed):
+        """Check a riddle against history and riddles already taken in this run"""
+        key = riddle['question'].strip().lower()
+        with self.history_lock:
+            if key in claimed or self.history.is_riddle_used(riddle):
+                return False
+            claimed.add(key)
+            return True
 
-    def generate_riddles(self, count=3, max_attempts=3):
-        """Generate unique riddles with theme rotation and length constraints"""
+    def _fill_riddle_set(self, count, max_attempts, theme=None, claimed=None, on_riddle=None):
+        claimed = set() if claimed is None else claimed
         unique_riddles = []
         attempts = 0
         
@@ -129,28 +218,68 @@ class AdvancedRiddleGenerator:
             print(f"\nAttempt {attempts + 1} to generate {count - len(unique_riddles)} unique riddles...")
             
             batch_size = (count - len(unique_riddles)) * 2
-            riddles = self._generate_riddle_batch(batch_size, attempts + 1)
-            
-            if riddles:
-                for riddle in riddles:
-                    if not self.history.is_riddle_used(riddle):
-                        unique_riddles.append(riddle)
-                        print(f"✓ New unique riddle ({riddle['metadata']['category']}/{riddle['metadata']['type']})")
-                        print(f"  Question: {len(riddle['question'].split())} words")
-                        print(f"  Answer: {len(riddle['answer'].split())} words")
-                        if len(unique_riddles) >= count:
-                            break
-                    else:
-                        print(f"✗ Duplicate found, skipping...")
+            for riddle in self._generate_riddle_batch(batch_size, attempts + 1, theme):
+                if self._claim_unique(riddle, claimed):
+                    unique_riddles.append(riddle)
+                    print(f"✓ New unique riddle ({riddle['metadata']['category']}/{riddle['metadata']['type']})")
+                    print(f"  Question: {len(riddle['question'].split())} words")
+                    print(f"  Answer: {len(riddle['answer'].split())} words")
+                    if on_riddle:
+                        on_riddle(riddle)
+                    if len(unique_riddles) >= count:
+                        break
+                else:
+                    print(f"✗ Duplicate found, skipping...")
             
             if len(unique_riddles) < count:
                 print(f"Need {count - len(unique_riddles)} more riddles...")
             
             attempts += 1
         
+        return unique_riddles[:count]
+
+    def generate_riddles(self, count=3, max_attempts=3, on_riddle=None):
+        """Generate unique riddles with theme rotation and length constraints.
+
+        on_riddle, if given, is called with each accepted riddle as soon as
+        it is parsed, before the rest of the batch has arrived.
+        """
+        unique_riddles = self._fill_riddle_set(count, max_attempts, on_riddle=on_riddle)
+        
         if unique_riddles:
             self.history.add_riddles(unique_riddles)
             total_riddles = self.history.get_riddle_count()
             print(f"\nSuccess! Total unique riddles in history: {total_riddles}")
             
-        return unique_riddles[:count] if unique_riddles else None
\ No newline at end of file
+        return unique_riddles if unique_riddles else None
+
+    def generate_riddle_sets(self, schedule, count=3, max_attempts=3, max_workers=8):
+        """Generate one riddle set per schedule entry concurrently.
+
+        Each entry is a dict with 'category', 'riddle_type' and 'complexity'
+        (see build_schedule). All requests share the rate limiter, and
+        riddles are deduplicated against history and across sets. Returns
+        a list aligned with the schedule, with None for sets that failed.
+        """
+        claimed = set()
+        themes = [(entry['category'], entry['complexity'], entry['riddle_type']) for entry in schedule]
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(self._fill_riddle_set, count, max_attempts, theme, claimed)
+                       for theme in themes]
+            riddle_sets = []
+            for theme, future in zip(themes, futures):
+                try:
+                    riddles = future.result()
+                except Exception as e:
+                    print(f"Failed to generate riddles for {theme[0]}/{theme[2]}: {str(e)}")
+                    riddles = []
+                riddle_sets.append(riddles if riddles else None)
+        
+        complete_sets = [riddles for riddles in riddle_sets if riddles]
+        if complete_sets:
+            self.history.add_riddles([riddle for riddles in complete_sets for riddle in riddles])
+            print(f"\nGenerated {len(complete_sets)}/{len(schedule)} riddle sets. "
+                  f"Total unique riddles in history: {self.history.get_riddle_count()}")
+        
+        return riddle_sets
@@ -7,13 +7,51 @@ import colorsys
 import time
 import os
 import random
+from concurrent.futures import ThreadPoolExecutor
 from gtts import gTTS
 from moviepy.editor import VideoFileClip, AudioFileClip, concatenate_audioclips, CompositeAudioClip
 from riddle_generator import RiddleGenerator
 from scipy.io import wavfile
-from youtube_shorts_uploader import YouTubeShortsUploader
+from youtube_shorts_uploader import YouTubeShortsUploader, QuotaExceededError, UploadRejectedError
 from advanced_riddle_generator import AdvancedRiddleGenerator
 
+# Named x264 encoder profiles. Our videos are mostly identical held frames, so
+# "stillimage" tuning and long GOPs let x264 spend almost nothing on repeats.
+ENCODER_PROFILES = {
+    "fast": {
+        "preset": "veryfast",
+        "crf": 26,
+        "tune": "stillimage",
+        "threads": 0,  # 0 lets x264 pick one thread per core
+        "gop": 300,
+        "keyint_min": 30,
+        "audio_bitrate": "96k",
+    },
+    "balanced": {
+        "preset": "medium",
+        "crf": 23,
+        "tune": "stillimage",
+        "threads": 0,
+        "gop": 150,
+        "keyint_min": 30,
+        "audio_bitrate": "128k",
+    },
+    "archival": {
+        "preset": "slow",
+        "crf": 18,
+        "tune": "animation",
+        "threads": 0,
+        "gop": 60,
+        "keyint_min": 15,
+        "audio_bitrate": "192k",
+    },
+}
+
+# The frame-by-frame pass is re-encoded when the audio is muxed in, so it only
+# needs to be fast and close to lossless.
+INTERMEDIATE_PRESET = "ultrafast"
+INTERMEDIATE_CRF = 12
+
 def cleanup_video_files(output_path):
     """Delete video files if they exist"""
     files_to_delete = [
@@ -47,6 +85,9 @@ class EnhancedShortsGenerator:
         self.icon_pos = (self.width//2 - 160, 200)
         self.icon_img = self.load_icon()
         self.riddle_generator = AdvancedRiddleGenerator(api_key=api_key) if api_key else None
+        self.audio_executor = None
+        self.audio_prefetch = {}
+        self.prefetch_count = 0
         
         self.header_pos = (self.width//2, 150)
         self.timer_pos = (self.width//2, 700)
@@ -148,10 +189,104 @@ class EnhancedShortsGenerator:
         self.draw_text_with_effects(draw, str(int(time_remaining)), 
                               self.timer_pos, 120, 'white')
 
-    def generate_audio(self, text, output_path):
+    def synthesize_speech(self, text, output_path):
         tts = gTTS(text=text, lang='en')
         tts.save(output_path)
-        return AudioFileClip(output_path)
+        return output_path
+
+    def generate_audio(self, text, output_path):
+        return AudioFileClip(self.synthesize_speech(text, output_path))
+
+    def prefetch_audio(self, riddle):
+        """Start narrating a riddle in the background as soon as it is generated.
+
+        Pass as on_riddle to generate_riddles so TTS overlaps the rest of
+        the LLM response. generate_video picks up the finished files.
+        """
+        if self.audio_executor is None:
+            self.audio_executor = ThreadPoolExecutor(max_workers=4)
+        for text in (riddle["question"], riddle["answer"]):
+            if text in self.audio_prefetch:
+                continue
+            path = f"prefetch_{self.prefetch_count}.mp3"
+            self.prefetch_count += 1
+            self.audio_prefetch[text] = self.audio_executor.submit(self.synthesize_speech, text, path)
+
+    def _get_audio(self, text, output_path):
+        """Use prefetched narration if there is any, otherwise synthesize it now"""
+        future = self.audio_prefetch.pop(text, None)
+        if future:
+            try:
+                os.replace(future.result(), output_path)
+                return AudioFileClip(output_path)
+            except Exception as e:
+                print(f"Prefetched audio failed, regenerating: {e}")
+        return self.generate_audio(text, output_path)
+
+    def discard_audio_prefetch(self):
+        """Remove prefetched narration for riddles that were not rendered"""
+        for future in self.audio_prefetch.values():
+            try:
+                path = future.result()
+                if os.path.exists(path):
+                    os.remove(path)
+            except Exception:
+                pass
+        self.audio_prefetch = {}
+
+    def get_encoder_settings(self, profile="balanced", overrides=None):
+        """Resolve a named encoder profile, applying any per-run overrides.
+
+        Custom dict profiles are merged onto the balanced profile. Raises
+        ValueError for unknown profile names or settings.
+        """
+        if isinstance(profile, dict):
+            settings = dict(ENCODER_PROFILES['balanced'])
+            custom = dict(profile)
+        elif profile in ENCODER_PROFILES:
+            settings = dict(ENCODER_PROFILES[profile])
+            custom = {}
+        else:
+            raise ValueError(f"Unknown encoder profile: {profile}. "
+                             f"Choose from {', '.join(ENCODER_PROFILES)}")
+        if overrides:
+            custom.update(overrides)
+        unknown = set(custom) - set(settings)
+        if unknown:
+            raise ValueError(f"Unknown encoder settings: {', '.join(sorted(unknown))}")
+        settings.update(custom)
+        return settings
+
+    def _x264_params(self, settings, crf=None):
+        """Build the libx264 rate control, tuning and keyframe arguments"""
+        params = [
+            '-crf', str(settings['crf'] if crf is None else crf),
+            '-g', str(settings['gop']),
+            '-keyint_min', str(settings['keyint_min']),
+        ]
+        if settings.get('tune'):
+            params.extend(['-tune', settings['tune']])
+        return params
+
+    def _open_writer(self, output_path, settings):
+        """Open the writer used for the raw frame pass"""
+        ffmpeg_params = ['-preset', INTERMEDIATE_PRESET,
+                         '-threads', str(settings['threads'])]
+        ffmpeg_params += self._x264_params(settings, crf=INTERMEDIATE_CRF)
+        return imageio.get_writer(output_path, fps=self.fps,
+                                  codec='libx264', quality=None,
+                                  pixelformat='yuv420p',
+                                  macro_block_size=8,
+                                  ffmpeg_params=ffmpeg_params)
+
+    def _write_final(self, video, audio, output_path, settings):
+        """Mux the audio track and encode the final video with the chosen profile"""
+        final_video = video.set_audio(audio)
+        final_video.write_videofile(output_path, codec='libx264', audio_codec='aac',
+                                    audio_bitrate=settings['audio_bitrate'],
+                                    preset=settings['preset'],
+                                    threads=settings['threads'],
+                                    ffmpeg_params=self._x264_params(settings))
 
     def create_frame(self, questions, q_index, show_question=True, timer=None, answer_progress=0):
         frame = self.base_background.copy()
@@ -176,7 +311,13 @@ class EnhancedShortsGenerator:
             
         return np.array(frame)
     
-    def generate_video(self, questions, output_path, audio_path=None):
+    def generate_video(self, questions, output_path, audio_path=None,
+                       encoder_profile="balanced", encoder_options=None):
+        # Resolve the profile up front so bad settings fail fast instead of
+        # being swallowed as a render error
+        settings = self.get_encoder_settings(encoder_profile, encoder_options)
+        profile_name = encoder_profile if isinstance(encoder_profile, str) else "custom"
+        
         try:
             countdown_duration = 5
             answer_duration = 3
@@ -184,10 +325,7 @@ class EnhancedShortsGenerator:
             
             cleanup_video_files(output_path)
             
-            writer = imageio.get_writer(output_path, fps=self.fps,
-                                    codec='h264', quality=9,
-                                    pixelformat='yuv420p',
-                                    macro_block_size=8)
+            writer = self._open_writer(output_path, settings)
             
             audio_clips = []
             silence_path = self.create_silence(10)
@@ -206,13 +344,16 @@ class EnhancedShortsGenerator:
                 q_audio_path = f"question_{q_index}.mp3"
                 a_audio_path = f"answer_{q_index}.mp3"
                 
-                q_clip = self.generate_audio(question["question"], q_audio_path)
-                a_clip = self.generate_audio(question["answer"], a_audio_path)
+                q_clip = self._get_audio(question["question"], q_audio_path)
+                a_clip = self._get_audio(question["answer"], a_audio_path)
                 
                 question_clips.append(q_clip)
                 answer_clips.append(a_clip)
+            self.discard_audio_prefetch()
             
             total_duration = 0
+            frame_count = 0
+            render_start = time.time()
             
             for q_index, (q_clip, a_clip) in enumerate(zip(question_clips, answer_clips)):
                 question_duration = q_clip.duration
@@ -221,18 +362,21 @@ class EnhancedShortsGenerator:
                 blank_duration = 0.5
                 for _ in range(int(blank_duration * self.fps)):
                     writer.append_data(blank_frame)
+                    frame_count += 1
                 audio_clips.append(silence.subclip(0, blank_duration))
                 total_duration += blank_duration
                 
                 question_frame = self.create_frame(questions, q_index)
                 for _ in range(int(question_duration * self.fps)):
                     writer.append_data(question_frame)
+                    frame_count += 1
                 audio_clips.append(q_clip)
                 total_duration += question_duration
                 
                 pause_duration = 1
                 for _ in range(int(pause_duration * self.fps)):
                     writer.append_data(question_frame)
+                    frame_count += 1
                 audio_clips.append(silence.subclip(0, pause_duration))
                 total_duration += pause_duration
                 
@@ -240,6 +384,7 @@ class EnhancedShortsGenerator:
                 for t in np.linspace(countdown_duration, 0, countdown_duration*self.fps, endpoint=False):
                     frame = self.create_frame(questions, q_index, timer=math.ceil(t))
                     writer.append_data(frame)
+                    frame_count += 1
                 audio_clips.append(countdown_silence)
                 total_duration += countdown_duration
                 
@@ -247,6 +392,7 @@ class EnhancedShortsGenerator:
                 for p in np.linspace(0, 1, answer_frames):
                     frame = self.create_frame(questions, q_index, answer_progress=p)
                     writer.append_data(frame)
+                    frame_count += 1
                 audio_clips.append(a_clip)
                 total_duration += max(answer_duration, a_clip.duration)
                 
@@ -259,6 +405,7 @@ class EnhancedShortsGenerator:
                     last_frame = self.create_frame(questions, q_index, answer_progress=1)
                     for _ in range(question_delay * self.fps):
                         writer.append_data(last_frame)
+                        frame_count += 1
                     audio_clips.append(silence.subclip(0, question_delay))
                     total_duration += question_delay
                 
@@ -267,6 +414,7 @@ class EnhancedShortsGenerator:
                 print(f"Progress: {progress:.1f}% | Time elapsed: {elapsed:.1f}s")
             
             writer.close()
+            render_elapsed = time.time() - render_start
             
             final_voice = concatenate_audioclips(audio_clips)
             
@@ -280,8 +428,15 @@ class EnhancedShortsGenerator:
                 final_audio = final_voice
             
             video = VideoFileClip(output_path)
-            final_video = video.set_audio(final_audio)
-            final_video.write_videofile(f"final_{output_path}", codec='libx264', audio_codec='aac')
+            encode_start = time.time()
+            self._write_final(video, final_audio, f"final_{output_path}", settings)
+            encode_elapsed = time.time() - encode_start
+            
+            output_kbps = os.path.getsize(f"final_{output_path}") * 8 / video.duration / 1000
+            print(f"Encoder profile '{profile_name}': "
+                  f"frame pass {frame_count / render_elapsed:.1f} fps | "
+                  f"final encode {frame_count / encode_elapsed:.1f} fps | "
+                  f"output bitrate {output_kbps:.0f} kbps")
             
             video.close()
             final_audio.close()
@@ -300,6 +455,7 @@ class EnhancedShortsGenerator:
             
         except Exception as e:
             print(f"Error generating video: {e}")
+            self.discard_audio_prefetch()
             cleanup_video_files(output_path)
             return False
 
@@ -307,7 +463,10 @@ class EnhancedShortsGenerator:
 if __name__ == "__main__":
     # Replace with your API key or load from environment variables
     api_key = os.environ.get("RIDDLE_API_KEY", "")  
+    encoder_profile = os.environ.get("ENCODER_PROFILE", "balanced")
     generator = EnhancedShortsGenerator(api_key=api_key)
+    # Fail on a bad profile before spending any API calls
+    generator.get_encoder_settings(encoder_profile)
     
     # Initialize the uploader with your credentials
     uploader = YouTubeShortsUploader(
@@ -318,16 +477,25 @@ if __name__ == "__main__":
     
     print("Generating riddles...")
     riddle_generator = AdvancedRiddleGenerator(api_key=api_key)
-    riddles = riddle_generator.generate_riddles()
+    # Narration for each riddle starts as soon as it is parsed
+    riddles = riddle_generator.generate_riddles(on_riddle=generator.prefetch_audio)
     
     if riddles:
         output_path = "puzzle_shorts.mp4"
         print("Generating video...")
         
-        if generator.generate_video(questions=riddles, output_path=output_path):
+        if generator.generate_video(questions=riddles, output_path=output_path,
+                                    encoder_profile=encoder_profile):
             print("Uploading to YouTube...")
             riddle_content = " | ".join([f"Q: {r['question']} A: {r['answer']}" for r in riddles])
-            video_id = uploader.upload_short(f"final_{output_path}", riddle_content)
+            try:
+                video_id = uploader.upload_short(f"final_{output_path}", riddle_content)
+            except QuotaExceededError:
+                print("YouTube API quota exhausted for today.")
+                video_id = None
+            except UploadRejectedError as e:
+                print(f"YouTube rejected the upload: {e}")
+                video_id = None
             
             if video_id:
                 print(f"Successfully uploaded! Video ID: {video_id}")
@@ -0,0 +1,259 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing
+
+RENDER_QUEUE = "render"
+UPLOAD_QUEUE = "upload"
+
+
+def make_worker_id(role):
+    """Worker id unique across the hosts sharing the queue"""
+    return f"{role}-{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+class JobQueue:
+    """SQLite-backed job queue shared by render and upload workers.
+
+    Workers claim a job by taking a lease on it and must keep calling
+    heartbeat() while they work. If a worker crashes its lease runs out and
+    the job becomes claimable again. Point every worker at the same database
+    on shared storage. The database uses SQLite's default rollback journal,
+    which relies on POSIX advisory locks (fcntl). Only use a shared filesystem
+    whose locks work across hosts, such as NFSv4 with locking enabled or
+    CephFS. SMB/CIFS mounts and NFS mounted with nolock are not safe.
+    """
+
+    def __init__(self, db_path='jobs.db', lease_seconds=300, max_attempts=3):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._init_db()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self):
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    queue TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    worker_id TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    available_at REAL NOT NULL,
+                    lease_expires REAL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    result TEXT,
+                    error TEXT
+                )
+            """)
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_jobs_claim
+                ON jobs (queue, status, priority, created_at)
+            """)
+
+    def _row_to_job(self, row):
+        if row is None:
+            return None
+        job = dict(row)
+        job['payload'] = json.loads(job['payload'])
+        if job['result']:
+            job['result'] = json.loads(job['result'])
+        return job
+
+    def enqueue(self, queue, payload, priority=0, available_at=None):
+        """Add a job to a queue and return its id. Higher priority runs first."""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, queue, payload, priority, available_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, queue, json.dumps(payload), priority,
+                 available_at if available_at is not None else now, now, now)
+            )
+        return job_id
+
+    def claim(self, queue, worker_id):
+        """Lease the next runnable job, reclaiming jobs whose lease has expired"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            # A job whose worker died on every attempt (OOM, ffmpeg crash)
+            # never reaches fail(), so retire it here instead of handing it
+            # to the next worker
+            retired = conn.execute(
+                "UPDATE jobs SET status = 'failed', error = 'Lease expired on final attempt', "
+                "worker_id = NULL, lease_expires = NULL, updated_at = ? "
+                "WHERE queue = ? AND status = 'running' AND lease_expires < ? AND attempts >= ?",
+                (now, queue, now, self.max_attempts)
+            ).rowcount
+            if retired:
+                print(f"Marked {retired} job(s) failed after {self.max_attempts} expired leases")
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE queue = ? AND available_at <= ? AND "
+                "(status = 'pending' OR (status = 'running' AND lease_expires < ?)) "
+                "ORDER BY priority DESC, created_at LIMIT 1",
+                (queue, now, now)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            if row['status'] == 'running':
+                print(f"Reclaiming job {row['id']} from expired worker {row['worker_id']}")
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker_id = ?, attempts = attempts + 1, "
+                "lease_expires = ?, updated_at = ? WHERE id = ?",
+                (worker_id, now + self.lease_seconds, now, row['id'])
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return self.get_job(row['id'])
+
+    def heartbeat(self, job_id, worker_id):
+        """Extend a lease. Returns False if the worker no longer owns the job."""
+        now = time.time()
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires = ?, updated_at = ? "
+                "WHERE id = ? AND worker_id = ? AND status = 'running'",
+                (now + self.lease_seconds, now, job_id, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, job_id, worker_id, result=None):
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'done', result = ?, lease_expires = NULL, updated_at = ? "
+                "WHERE id = ? AND worker_id = ? AND status = 'running'",
+                (json.dumps(result), time.time(), job_id, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def complete_and_enqueue(self, job_id, worker_id, queue, payload, priority=0, result=None):
+        """Complete a job and queue its follow-up job in one transaction.
+
+        Nothing is queued if the worker no longer owns the job. Returns the
+        new job id, or None in that case.
+        """
+        next_job_id = uuid.uuid4().hex
+        now = time.time()
+        result = dict(result or {}, next_job_id=next_job_id)
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'done', result = ?, lease_expires = NULL, updated_at = ? "
+                "WHERE id = ? AND worker_id = ? AND status = 'running'",
+                (json.dumps(result), now, job_id, worker_id)
+            )
+            if cursor.rowcount != 1:
+                conn.execute("ROLLBACK")
+                return None
+            conn.execute(
+                "INSERT INTO jobs (id, queue, payload, priority, available_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (next_job_id, queue, json.dumps(payload), priority, now, now, now)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return next_job_id
+
+    def fail(self, job_id, worker_id, error, retry_delay=60, permanent=False):
+        """Release a job after an error, retrying it until max_attempts is reached.
+
+        Pass permanent=True for errors a retry can't fix.
+        """
+        now = time.time()
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return False
+            status = 'pending' if row['attempts'] < self.max_attempts and not permanent else 'failed'
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, worker_id = NULL, lease_expires = NULL, "
+                "available_at = ?, updated_at = ? WHERE id = ? AND worker_id = ? AND status = 'running'",
+                (status, str(error), now + retry_delay, now, job_id, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def release(self, job_id, worker_id, available_at):
+        """Hand a job back without counting the attempt, e.g. to defer it"""
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'pending', worker_id = NULL, lease_expires = NULL, "
+                "attempts = MAX(attempts - 1, 0), available_at = ?, updated_at = ? "
+                "WHERE id = ? AND worker_id = ? AND status = 'running'",
+                (available_at, time.time(), job_id, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def get_job(self, job_id):
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row)
+
+    def get_counts(self, queue):
+        """Return the number of jobs per status for a queue"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT status, COUNT(*) AS n FROM jobs WHERE queue = ? GROUP BY status",
+                (queue,)
+            ).fetchall()
+        return {row['status']: row['n'] for row in rows}
+
+
+class Heartbeat:
+    """Keeps a job lease alive from a background thread while the job runs"""
+
+    def __init__(self, queue, job_id, worker_id, interval=None):
+        self.queue = queue
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.interval = interval or max(queue.lease_seconds / 3, 1)
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                if not self.queue.heartbeat(self.job_id, self.worker_id):
+                    print(f"Lost lease on job {self.job_id}")
+                    self.lost = True
+                    return
+            except Exception as e:
+                print(f"Heartbeat failed for job {self.job_id}: {e}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
@@ -0,0 +1,198 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+import numpy as np
+from PIL import Image
+from scipy.io import wavfile
+from moviepy.editor import AudioFileClip
+from app import EnhancedShortsGenerator, cleanup_video_files
+
+GOLDEN_RIDDLES = [
+    {
+        "question": "I have keys but open no doors, I have space but no rooms inside",
+        "answer": "A keyboard, the tool you use to type every day"
+    },
+    {
+        "question": "The more of me you take, the more you leave behind on your walk",
+        "answer": "Footsteps, the marks you leave with every step you take"
+    },
+    {
+        "question": "I fly without wings and cry without eyes, wherever I go darkness follows me",
+        "answer": "A storm cloud, carrying rain and shadow across the sky above"
+    },
+]
+
+# Stub narration length per word, roughly the pace of gTTS
+STUB_SECONDS_PER_WORD = 0.35
+STUB_SAMPLE_RATE = 44100
+
+
+def frame_dhash(frame, hash_size=8):
+    """Perceptual difference hash of a frame as a hex string"""
+    image = Image.fromarray(frame).convert('L').resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = np.asarray(image, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return f"{int(''.join('1' if b else '0' for b in bits), 2):0{hash_size * hash_size // 4}x}"
+
+
+def hamming_distance(hash_a, hash_b):
+    return bin(int(hash_a, 16) ^ int(hash_b, 16)).count('1')
+
+
+class HashingWriter:
+    """Wraps a video writer and records exact and perceptual hashes of every frame"""
+
+    def __init__(self, writer, frame_hashes):
+        self.writer = writer
+        self.frame_hashes = frame_hashes
+        self.first_frame_time = None
+        self.last_frame_time = None
+        self.hash_seconds = 0.0
+        self._dhash_cache = {}
+
+    def append_data(self, frame):
+        if self.first_frame_time is None:
+            self.first_frame_time = time.time()
+        hash_start = time.time()
+        # Every frame gets an exact hash, even if it is the same buffer as
+        # the previous one, so in-place reuse can't hide a change. Only the
+        # perceptual hash is reused for identical content.
+        sha256 = hashlib.sha256(np.ascontiguousarray(frame).tobytes()).hexdigest()
+        if sha256 not in self._dhash_cache:
+            self._dhash_cache[sha256] = frame_dhash(frame)
+        self.frame_hashes.append([sha256, self._dhash_cache[sha256]])
+        self.hash_seconds += time.time() - hash_start
+        self.writer.append_data(frame)
+        self.last_frame_time = time.time()
+
+    def close(self):
+        self.writer.close()
+
+
+class DeterministicShortsGenerator(EnhancedShortsGenerator):
+    """EnhancedShortsGenerator with fixed music and stub TTS for repeatable renders"""
+
+    def __init__(self, music_path=None):
+        super().__init__(api_key=None)
+        self.music_path = music_path
+        self.frame_hashes = []
+        self.audio_checksum = None
+        self.hashing_writer = None
+
+    def get_random_music(self):
+        return self.music_path
+
+    def generate_audio(self, text, output_path):
+        # A tone whose length and pitch depend only on the text
+        duration = len(text.split()) * STUB_SECONDS_PER_WORD
+        t = np.arange(int(duration * STUB_SAMPLE_RATE)) / STUB_SAMPLE_RATE
+        frequency = 220 + (len(text) % 20) * 10
+        audio_data = (np.sin(2 * np.pi * frequency * t) * 8000).astype(np.int16)
+        wavfile.write(output_path, STUB_SAMPLE_RATE, audio_data)
+        return AudioFileClip(output_path)
+
+    def _open_writer(self, output_path, settings):
+        self.hashing_writer = HashingWriter(super()._open_writer(output_path, settings),
+                                            self.frame_hashes)
+        return self.hashing_writer
+
+    def _write_final(self, video, audio, output_path, settings):
+        samples = audio.to_soundarray(fps=STUB_SAMPLE_RATE, quantize=True, nbytes=2)
+        self.audio_checksum = hashlib.sha256(np.ascontiguousarray(samples).tobytes()).hexdigest()
+        super()._write_final(video, audio, output_path, settings)
+
+
+def render_manifest(output_path="harness_render.mp4", music_path=None, encoder_profile="fast"):
+    """Render the golden riddles and return the manifest plus timing stats"""
+    generator = DeterministicShortsGenerator(music_path=music_path)
+    start_time = time.time()
+    try:
+        if not generator.generate_video(GOLDEN_RIDDLES, output_path, encoder_profile=encoder_profile):
+            raise RuntimeError("Harness render failed")
+    finally:
+        cleanup_video_files(output_path)
+    total_elapsed = time.time() - start_time
+
+    writer = generator.hashing_writer
+    frame_count = len(generator.frame_hashes)
+    # Leave out the harness's own hashing so the figure reflects rendering
+    frame_elapsed = writer.last_frame_time - writer.first_frame_time - writer.hash_seconds
+    manifest = {
+        'width': generator.width,
+        'height': generator.height,
+        'fps': generator.fps,
+        'font': os.path.basename(generator.font_bold),
+        'music': music_path,
+        'frame_count': frame_count,
+        'audio_sha256': generator.audio_checksum,
+        'frames': generator.frame_hashes,
+    }
+    stats = {
+        'frame_fps': frame_count / frame_elapsed if frame_elapsed > 0 else float('inf'),
+        'hash_seconds': writer.hash_seconds,
+        'total_seconds': total_elapsed,
+    }
+    return manifest, stats
+
+
+def compare_manifests(golden, current):
+    """Return a list of differences, starting with the first diverging frame"""
+    differences = []
+    for key in ('width', 'height', 'fps'):
+        if golden[key] != current[key]:
+            differences.append(f"{key} changed: {golden[key]} -> {current[key]}")
+    # A different font changes every frame, so flag the environment first
+    if golden.get('font') != current['font']:
+        differences.append(f"Font changed: {golden.get('font')} -> {current['font']} "
+                           f"(render environment differs from the golden manifest)")
+
+    for index, (golden_hashes, current_hashes) in enumerate(zip(golden['frames'], current['frames'])):
+        if golden_hashes[0] != current_hashes[0]:
+            distance = hamming_distance(golden_hashes[1], current_hashes[1])
+            seconds = index / golden['fps']
+            differences.append(f"First diverging frame: {index} ({seconds:.2f}s), "
+                               f"perceptual distance {distance}/64")
+            break
+
+    if golden['frame_count'] != current['frame_count']:
+        differences.append(f"Frame count changed: {golden['frame_count']} -> {current['frame_count']}")
+    if golden['audio_sha256'] != current['audio_sha256']:
+        differences.append("Audio samples differ")
+    return differences
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Golden-frame regression harness for video rendering")
+    parser.add_argument("mode", choices=["record", "compare"])
+    parser.add_argument("manifest", nargs="?", default="golden_manifest.json",
+                        help="Path to the golden manifest")
+    parser.add_argument("--music", help="Background track to use instead of a random pick")
+    parser.add_argument("--profile", default="fast", help="Encoder profile for the render")
+    args = parser.parse_args()
+
+    golden = None
+    music_path = args.music
+    if args.mode == "compare":
+        with open(args.manifest, 'r') as f:
+            golden = json.load(f)
+        # Render with the same track the golden manifest was recorded with
+        music_path = music_path or golden['music']
+
+    manifest, stats = render_manifest(music_path=music_path, encoder_profile=args.profile)
+    print(f"Rendered {manifest['frame_count']} frames at {stats['frame_fps']:.1f} fps "
+          f"excluding {stats['hash_seconds']:.1f}s of hashing ({stats['total_seconds']:.1f}s total)")
+
+    if args.mode == "record":
+        with open(args.manifest, 'w') as f:
+            json.dump(manifest, f)
+        print(f"Golden manifest saved to {args.manifest}")
+    else:
+        differences = compare_manifests(golden, manifest)
+        if differences:
+            for difference in differences:
+                print(f"✗ {difference}")
+            sys.exit(1)
+        print("✓ Render matches golden manifest")
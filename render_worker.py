@@ -0,0 +1,142 @@
+import argparse
+import os
+import shutil
+import time
+from job_queue import JobQueue, Heartbeat, RENDER_QUEUE, UPLOAD_QUEUE, make_worker_id
+
+
+def publish_artifact(src_path, storage_dir, artifact_name):
+    """Move a finished video into shared storage under a stable name"""
+    os.makedirs(storage_dir, exist_ok=True)
+    dest_path = os.path.join(storage_dir, f"{artifact_name}.mp4")
+    tmp_path = f"{dest_path}.partial"
+    shutil.move(src_path, tmp_path)
+    # Rename last so the upload worker never sees a half-copied file
+    os.replace(tmp_path, dest_path)
+    return dest_path
+
+
+def run_render_worker(queue, storage_dir, api_key, poll_interval=5, once=False):
+    """Render videos from the render queue and hand them to the upload queue.
+
+    Rendering writes scratch files into the working directory, so run one
+    render worker per working directory.
+    """
+    from app import EnhancedShortsGenerator, cleanup_video_files
+
+    worker_id = make_worker_id("render")
+    generator = EnhancedShortsGenerator(api_key=api_key)
+    print(f"Render worker {worker_id} started")
+
+    while True:
+        job = queue.claim(RENDER_QUEUE, worker_id)
+        if job is None:
+            if once:
+                return
+            time.sleep(poll_interval)
+            continue
+
+        job_id = job['id']
+        payload = job['payload']
+        output_path = f"render_{job_id}.mp4"
+        print(f"Rendering job {job_id} (attempt {job['attempts']})")
+
+        try:
+            with Heartbeat(queue, job_id, worker_id) as heartbeat:
+                riddles = payload.get('riddles')
+                if not riddles:
+                    if not generator.riddle_generator:
+                        raise ValueError("Job has no riddles and no API key is configured")
+                    riddles = generator.riddle_generator.generate_riddles(
+                        count=payload.get('count', 3), on_riddle=generator.prefetch_audio)
+                if not riddles:
+                    raise ValueError("Failed to generate riddles")
+
+                rendered = generator.generate_video(
+                    questions=riddles,
+                    output_path=output_path,
+                    encoder_profile=payload.get('encoder_profile', 'balanced'),
+                    encoder_options=payload.get('encoder_options'))
+                if not rendered:
+                    raise RuntimeError("Video generation failed")
+
+            if heartbeat.lost:
+                # Another worker has picked the job up, don't publish a duplicate
+                cleanup_video_files(output_path)
+                continue
+
+            # Name the artifact per attempt so a worker that lost its lease
+            # never overwrites or deletes the new owner's copy
+            video_path = publish_artifact(f"final_{output_path}", storage_dir,
+                                          f"{job_id}-{job['attempts']}")
+            cleanup_video_files(output_path)
+            riddle_content = " | ".join([f"Q: {r['question']} A: {r['answer']}" for r in riddles])
+            upload_job_id = queue.complete_and_enqueue(job_id, worker_id, UPLOAD_QUEUE, {
+                'video_path': video_path,
+                'riddle_content': riddle_content,
+                'render_job_id': job_id,
+                'publish_at': payload.get('publish_at'),
+            }, priority=payload.get('priority', 0), result={'video_path': video_path})
+            if upload_job_id is None:
+                # The lease ran out after rendering and the job now belongs to
+                # another worker, which will publish its own copy
+                print(f"Lost lease on job {job_id} before completion, discarding {video_path}")
+                os.remove(video_path)
+                continue
+            print(f"Job {job_id} rendered to {video_path}")
+
+        except Exception as e:
+            print(f"Render job {job_id} failed: {e}")
+            generator.discard_audio_prefetch()
+            cleanup_video_files(output_path)
+            queue.fail(job_id, worker_id, e)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distributed render and upload workers")
+    parser.add_argument("mode", choices=["render", "upload", "enqueue", "status"])
+    parser.add_argument("--db", default=os.environ.get("JOB_DB", "jobs.db"),
+                        help="Path to the shared job database")
+    parser.add_argument("--storage", default=os.environ.get("RENDER_STORAGE", "rendered"),
+                        help="Shared directory for finished videos")
+    parser.add_argument("--lease", type=int, default=300, help="Job lease length in seconds")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of render jobs to enqueue")
+    parser.add_argument("--profile", default="balanced", help="Encoder profile for enqueued jobs")
+    parser.add_argument("--priority", type=int, default=0, help="Priority for enqueued jobs")
+    parser.add_argument("--publish-at", help="RFC 3339 time to publish enqueued videos")
+    parser.add_argument("--quota", type=int, default=10000, help="Daily YouTube API quota units")
+    parser.add_argument("--once", action="store_true", help="Exit when the queue is empty")
+    args = parser.parse_args()
+
+    api_key = os.environ.get("RIDDLE_API_KEY", "")
+    queue = JobQueue(args.db, lease_seconds=args.lease)
+
+    if args.mode == "render":
+        run_render_worker(queue, args.storage, api_key, once=args.once)
+    elif args.mode == "upload":
+        from youtube_shorts_uploader import YouTubeShortsUploader
+        from upload_scheduler import UploadScheduler, QuotaBucket
+        uploader = YouTubeShortsUploader(
+            client_secrets_file='client-secret.json',
+            target_channel_id=os.environ.get("YOUTUBE_CHANNEL_ID", ""),
+            api_key=api_key
+        )
+        scheduler = UploadScheduler(uploader, queue, QuotaBucket(capacity=args.quota))
+        scheduler.run(once=args.once)
+    elif args.mode == "enqueue":
+        publish_at = None
+        if args.publish_at:
+            from upload_scheduler import parse_publish_at
+            try:
+                publish_at = parse_publish_at(args.publish_at).isoformat()
+            except ValueError as e:
+                parser.error(str(e))
+        for _ in range(args.jobs):
+            job_id = queue.enqueue(RENDER_QUEUE, {'encoder_profile': args.profile,
+                                                  'priority': args.priority,
+                                                  'publish_at': publish_at},
+                                   priority=args.priority)
+            print(f"Queued render job {job_id}")
+    else:
+        print(f"Render queue: {queue.get_counts(RENDER_QUEUE)}")
+        print(f"Upload queue: {queue.get_counts(UPLOAD_QUEUE)}")
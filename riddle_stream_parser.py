@@ -0,0 +1,111 @@
+import json
+import re
+
+TRAILING_COMMA = re.compile(r',\s*}')
+
+
+class RiddleStreamParser:
+    """Extracts riddle objects from LLM output incrementally.
+
+    Feed text chunks as they arrive and every {...} object holding both a
+    'question' and an 'answer' is returned as soon as its closing brace is
+    seen, however deeply it is nested (e.g. {"riddles": [...]}). Code
+    fences, surrounding prose and a broken object in the middle of a batch
+    are skipped without losing the objects around them.
+    """
+
+    def __init__(self):
+        self.buffer = ''
+        self.pos = 0
+        # One frame per open brace: where it starts, whether it contains
+        # other objects, and whether anything has followed the brace yet
+        self.stack = []
+        self.in_string = False
+        self.escape = False
+        self.objects_found = 0
+        self.objects_skipped = 0
+
+    def feed(self, chunk):
+        """Add text and return the list of riddle objects completed by it"""
+        self.buffer += chunk
+        riddles = []
+
+        while self.pos < len(self.buffer):
+            char = self.buffer[self.pos]
+
+            # String state only matters inside an object, prose outside
+            # one may contain stray quotes
+            if self.stack and self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == '\\':
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+                elif char == '\n':
+                    # JSON strings can't span lines, so a quote went
+                    # missing. Abandon the innermost object and resync.
+                    self._skip(self.stack.pop())
+                    self.in_string = False
+            elif char == '{':
+                if self.stack:
+                    self.stack[-1]['has_child'] = True
+                    self.stack[-1]['started'] = True
+                self.stack.append({'start': self.pos, 'has_child': False, 'started': False})
+            elif not self.stack:
+                pass
+            elif not self.stack[-1]['started'] and not char.isspace():
+                # A JSON object must open with a quoted key or close at
+                # once. Anything else means the brace was prose, such as
+                # "Use the format {question, answer}".
+                if char == '"':
+                    self.stack[-1]['started'] = True
+                    self.in_string = True
+                elif char == '}':
+                    self.stack.pop()
+                else:
+                    self.stack.pop()
+                    continue
+            elif char == '"':
+                self.in_string = True
+            elif char == '}':
+                frame = self.stack.pop()
+                riddle = self._decode(frame, self.buffer[frame['start']:self.pos + 1])
+                if riddle is not None:
+                    riddles.append(riddle)
+            self.pos += 1
+
+        # Drop text that can no longer be part of an object
+        if not self.stack:
+            self.buffer = ''
+            self.pos = 0
+        elif self.stack[0]['start'] > 0:
+            offset = self.stack[0]['start']
+            self.buffer = self.buffer[offset:]
+            self.pos -= offset
+            for frame in self.stack:
+                frame['start'] -= offset
+
+        return riddles
+
+    def _skip(self, frame):
+        text = self.buffer[frame['start']:self.pos]
+        print(f"Skipping malformed object: {text[:100]}")
+        self.objects_skipped += 1
+
+    def _decode(self, frame, text):
+        for candidate in (text, TRAILING_COMMA.sub('}', text)):
+            try:
+                obj = json.loads(candidate)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(obj, dict) and 'question' in obj and 'answer' in obj:
+                self.objects_found += 1
+                return obj
+            return None
+        # Wrappers around a broken riddle fail to decode too, only report
+        # the innermost object
+        if not frame['has_child']:
+            print(f"Skipping malformed object: {text[:100]}")
+            self.objects_skipped += 1
+        return None
@@ -0,0 +1,213 @@
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from job_queue import JobQueue, Heartbeat, UPLOAD_QUEUE, make_worker_id
+from youtube_shorts_uploader import QuotaExceededError, UploadRejectedError
+
+try:
+    from zoneinfo import ZoneInfo
+    QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+except Exception:
+    # No tz database available, fall back to Pacific Standard Time
+    QUOTA_TIMEZONE = timezone(timedelta(hours=-8))
+
+# YouTube requires publishAt to still be in the future when the upload
+# finishes, so leave room for the upload itself
+PUBLISH_AT_MARGIN = timedelta(minutes=10)
+
+
+def parse_publish_at(value):
+    """Parse a publish time (datetime or RFC 3339 string) into an aware datetime.
+
+    Naive times are treated as local time. Raises ValueError for malformed
+    values or times that are already past.
+    """
+    if isinstance(value, datetime):
+        publish_at = value
+    else:
+        try:
+            publish_at = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+        except ValueError:
+            raise ValueError(f"Invalid publish time: {value}. Use RFC 3339, e.g. 2026-01-31T18:00:00+00:00")
+    publish_at = publish_at.astimezone()
+    if publish_at < datetime.now().astimezone() + PUBLISH_AT_MARGIN:
+        raise ValueError(f"Publish time {publish_at.isoformat()} is in the past or too soon")
+    return publish_at
+
+
+def next_quota_reset(now=None):
+    """YouTube Data API quotas reset at midnight Pacific time"""
+    now = now or time.time()
+    local = datetime.fromtimestamp(now, QUOTA_TIMEZONE)
+    midnight = datetime(local.year, local.month, local.day, tzinfo=QUOTA_TIMEZONE) + timedelta(days=1)
+    return midnight.timestamp()
+
+
+class QuotaBucket:
+    """Token bucket holding the day's YouTube API quota units.
+
+    The bucket refills to capacity at each quota reset rather than
+    continuously, matching how the API hands out quota.
+    """
+
+    def __init__(self, capacity=10000, state_file='upload_quota.json'):
+        self.capacity = capacity
+        self.state_file = state_file
+        self.tokens = capacity
+        self.reset_at = next_quota_reset()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, 'r') as f:
+                state = json.load(f)
+            self.tokens = min(state['tokens'], self.capacity)
+            self.reset_at = state['reset_at']
+        except Exception as e:
+            print(f"Failed to load quota state: {str(e)}")
+
+    def _save(self):
+        try:
+            with open(self.state_file, 'w') as f:
+                json.dump({'tokens': self.tokens, 'reset_at': self.reset_at}, f, indent=2)
+        except Exception as e:
+            print(f"Failed to save quota state: {str(e)}")
+
+    def _refill(self):
+        now = time.time()
+        if now >= self.reset_at:
+            self.tokens = self.capacity
+            self.reset_at = next_quota_reset(now)
+            self._save()
+
+    def available(self):
+        self._refill()
+        return self.tokens
+
+    def charge(self, cost):
+        """Take units spent on issued API requests out of the bucket"""
+        self._refill()
+        self.tokens = max(self.tokens - cost, 0)
+        self._save()
+
+    def exhaust(self):
+        """Empty the bucket after the API reports the quota is spent"""
+        self.tokens = 0
+        self._save()
+
+    def seconds_until_reset(self):
+        return max(self.reset_at - time.time(), 0)
+
+
+class UploadScheduler:
+    """Feeds queued videos to YouTubeShortsUploader within the daily API quota.
+
+    Videos wait in the shared job queue and are uploaded highest priority
+    first. When the quota for the day is spent the scheduler sleeps until
+    the next reset instead of letting uploads fail. Quota usage is tracked
+    in a local state file, so run one scheduler per channel.
+    """
+
+    def __init__(self, uploader, queue=None, bucket=None, keep_artifacts=False):
+        self.uploader = uploader
+        self.queue = queue or JobQueue()
+        self.bucket = bucket or QuotaBucket()
+        self.keep_artifacts = keep_artifacts
+        self.worker_id = make_worker_id("upload")
+
+    def schedule(self, video_path, riddle_content, priority=0, publish_at=None):
+        """Queue a rendered video for upload and return the job id"""
+        if publish_at:
+            publish_at = parse_publish_at(publish_at).isoformat()
+        return self.queue.enqueue(UPLOAD_QUEUE, {
+            'video_path': video_path,
+            'riddle_content': riddle_content,
+            'publish_at': publish_at,
+        }, priority=priority)
+
+    def _wait_for_reset(self, once):
+        wait = self.bucket.seconds_until_reset()
+        reset_time = datetime.fromtimestamp(self.bucket.reset_at).strftime('%Y-%m-%d %H:%M')
+        print(f"Upload quota exhausted, deferring until {reset_time}")
+        if once:
+            return False
+        time.sleep(wait + 1)
+        return True
+
+    def run_next(self):
+        """Upload the next queued video. Returns False if nothing was uploaded."""
+        cost = self.uploader.estimate_upload_cost()
+        if self.bucket.available() < cost:
+            return False
+
+        job = self.queue.claim(UPLOAD_QUEUE, self.worker_id)
+        if job is None:
+            return False
+
+        job_id = job['id']
+        payload = job['payload']
+        publish_at = payload.get('publish_at')
+        if publish_at:
+            try:
+                publish_at = parse_publish_at(publish_at).isoformat()
+            except ValueError as e:
+                # The job was held past its slot (e.g. across a quota reset),
+                # YouTube would reject it, so publish it right away instead
+                print(f"{e}, publishing job {job_id} immediately")
+                publish_at = None
+        quota_before = self.uploader.quota_used
+        try:
+            with Heartbeat(self.queue, job_id, self.worker_id):
+                video_id = self.uploader.upload_short(payload['video_path'],
+                                                      payload['riddle_content'],
+                                                      publish_at=publish_at)
+        except QuotaExceededError as e:
+            # Our local count drifted from the API's, trust the API
+            print(f"Quota exceeded while uploading job {job_id}: {e}")
+            self.bucket.exhaust()
+            self.queue.release(job_id, self.worker_id, time.time())
+            return False
+        except UploadRejectedError as e:
+            print(f"Upload job {job_id} rejected, not retrying: {e}")
+            self.queue.fail(job_id, self.worker_id, e, permanent=True)
+            return True
+        except Exception as e:
+            print(f"Upload job {job_id} failed: {e}")
+            self.queue.fail(job_id, self.worker_id, e)
+            return True
+        finally:
+            # Only charge for requests that reached the API, so a bad file or
+            # a metadata error before videos.insert costs no quota
+            self.bucket.charge(self.uploader.quota_used - quota_before)
+
+        if not video_id:
+            self.queue.fail(job_id, self.worker_id, "Upload failed")
+            return True
+
+        self.queue.complete(job_id, self.worker_id, {'video_id': video_id})
+        print(f"Job {job_id} uploaded as {video_id} ({self.bucket.available()} quota units left)")
+        if not self.keep_artifacts and os.path.exists(payload['video_path']):
+            os.remove(payload['video_path'])
+        return True
+
+    def run(self, poll_interval=30, once=False):
+        """Process the upload queue, pausing across quota resets.
+
+        With once=True, return as soon as the queue is empty or the quota
+        is spent instead of waiting.
+        """
+        print(f"Upload scheduler {self.worker_id} started "
+              f"({self.bucket.available()}/{self.bucket.capacity} quota units available)")
+        while True:
+            if self.run_next():
+                continue
+            if self.bucket.available() < self.uploader.estimate_upload_cost():
+                if not self._wait_for_reset(once):
+                    return
+                continue
+            if once:
+                return
+            time.sleep(poll_interval)
@@ -11,6 +11,16 @@ import os
 import pickle
 from claude_client import ClaudeClient
 
+# Daily quota units charged by the YouTube Data API
+QUOTA_COST_VIDEOS_INSERT = 1600
+QUOTA_COST_CHANNELS_LIST = 1
+
+class QuotaExceededError(Exception):
+    """Raised when the YouTube Data API rejects a call because the daily quota is spent"""
+
+class UploadRejectedError(Exception):
+    """Raised when YouTube rejects an upload request in a way a retry won't fix"""
+
 class YouTubeShortsUploader:
     def __init__(self, client_secrets_file, api_key, target_channel_id=None):
         self.client_secrets_file = client_secrets_file
@@ -27,6 +37,9 @@ class YouTubeShortsUploader:
         )
 
         self.youtube = None
+        self.channel_verified = False
+        # Quota units spent on API requests actually issued this session
+        self.quota_used = 0
         
     def authenticate(self):
         """Handles OAuth 2.0 authentication with credential persistence"""
@@ -66,9 +79,30 @@ class YouTubeShortsUploader:
             self.authenticate()
             
         request = self.youtube.channels().list(part="id", mine=True)
+        self.quota_used += QUOTA_COST_CHANNELS_LIST
         response = request.execute()
         return response['items'][0]['id']
 
+    @staticmethod
+    def is_quota_error(error):
+        """Check whether an HttpError was caused by an exhausted quota"""
+        if error.resp.status != 403:
+            return False
+        content = error.content.decode('utf-8', 'ignore') if isinstance(error.content, bytes) else str(error.content)
+        return 'quotaExceeded' in content or 'dailyLimitExceeded' in content
+
+    @staticmethod
+    def is_permanent_error(error):
+        """Client errors (bad publishAt, invalid metadata) fail the same way every time"""
+        return 400 <= error.resp.status < 500 and error.resp.status not in (408, 429)
+
+    def estimate_upload_cost(self):
+        """Quota units the next upload_short call will spend"""
+        cost = QUOTA_COST_VIDEOS_INSERT
+        if self.target_channel_id and not self.channel_verified:
+            cost += QUOTA_COST_CHANNELS_LIST
+        return cost
+
     def generate_seo_content(self, riddle_content):
         """Generate YouTube Shorts title and description with niche-specific keywords"""
         prompt = f"""You are a YouTube Shorts metadata generator specializing in riddle and brain teaser content. Your task is to generate an engaging title and description for a riddle-based YouTube Short.
@@ -160,16 +194,26 @@ DO NOT include any other text or explanations."""
         else:
             return ['shorts', 'youtubeshorts', 'riddle', 'brainteaser']
     
-    def upload_short(self, video_path, riddle_content):
-        """Uploads video as a YouTube Short with AI-generated metadata"""
+    def upload_short(self, video_path, riddle_content, publish_at=None):
+        """Uploads video as a YouTube Short with AI-generated metadata.
+
+        If publish_at (datetime or RFC 3339 string) is given, the video is
+        uploaded as private and YouTube publishes it at that time.
+        """
         if not self.youtube:
             self.authenticate()
             
-        # Verify channel if specified
-        if self.target_channel_id:
-            current_channel = self.get_channel_id()
+        # Verify channel if specified, once per session
+        if self.target_channel_id and not self.channel_verified:
+            try:
+                current_channel = self.get_channel_id()
+            except HttpError as e:
+                if self.is_quota_error(e):
+                    raise QuotaExceededError(str(e)) from e
+                raise
             if current_channel != self.target_channel_id:
                 raise ValueError(f"Wrong channel! Authenticated as {current_channel}")
+            self.channel_verified = True
 
         # Generate SEO content
         title, description = self.generate_seo_content(riddle_content)
@@ -187,6 +231,13 @@ DO NOT include any other text or explanations."""
                 'selfDeclaredMadeForKids': False,
             }
         }
+        
+        if publish_at:
+            if isinstance(publish_at, datetime):
+                # Naive datetimes are treated as local time
+                publish_at = publish_at.astimezone().isoformat()
+            body['status']['privacyStatus'] = 'private'
+            body['status']['publishAt'] = publish_at
 
         try:
             insert_request = self.youtube.videos().insert(
@@ -201,6 +252,7 @@ DO NOT include any other text or explanations."""
             )
 
             print(f"Starting upload: {title}")
+            self.quota_used += QUOTA_COST_VIDEOS_INSERT
             response = insert_request.execute()
             
             video_id = response['id']
@@ -215,6 +267,10 @@ DO NOT include any other text or explanations."""
             return video_id
 
         except HttpError as e:
+            if self.is_quota_error(e):
+                raise QuotaExceededError(str(e)) from e
+            if self.is_permanent_error(e):
+                raise UploadRejectedError(str(e)) from e
             print(f"An HTTP error occurred: {str(e)}")
             return None
 